@@ -1,66 +1,114 @@
 import argparse
 import asyncio
-import re
 import sys
 import time
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
 import aiohttp
-import aiofiles
+from aiohttp.resolver import AsyncResolver
+from yarl import URL
 
-@dataclass
-class RequestResult:
-    host: str
-    success: bool
-    status_code: Optional[int]
-    duration: float
-    error: Optional[str] = None
+try:
+    # RE2 сопоставляет за линейное время, без бэктрекинга
+    import re2 as re
+except ImportError:
+    import re
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+# Признак ответа-ошибки (4xx/5xx) по коду статуса; коды HTTP трёхзначные
+FAIL_STATUS = bytearray(1000)
+FAIL_STATUS[400:600] = b'\x01' * 200
+
+# Предел одновременных запросов. Пул соединений не меньше него, иначе
+# ожидание свободного соединения попадает в замер времени ответа
+MAX_CONCURRENCY = 100
+
+# Заголовки GET-запроса для серверов, не поддерживающих HEAD
+RANGE_HEADERS = {'Range': 'bytes=0-0'}
+
+# Блок статистики по одному хосту, собирается одним вызовом format
+STATS_TEMPLATE = (
+    "\n" + "=" * 60 + "\n"
+    "Host: {host}\n"
+    + "-" * 60 + "\n"
+    "Success:        {stat.success_count}\n"
+    "Failed (4xx/5xx): {stat.failed_count}\n"
+    "Errors:         {stat.error_count}\n"
+    "Min time:       {stat.min_t:.3f} сек\n"
+    "Max time:       {stat.max_t:.3f} сек\n"
+    "Avg time:       {stat.avg_time:.3f} сек\n"
+    + "=" * 60 + "\n"
+)
 
-@dataclass
+@dataclass(slots=True)
 class HostStats:
     host: str
     success_count: int = 0
     failed_count: int = 0
     error_count: int = 0
-    times: List[float] = None
+    # Время считается на лету, без хранения всех замеров
+    n: int = 0
+    sum_t: float = 0.0
+    min_t: float = 0.0
+    max_t: float = 0.0
 
-    def __post_init__(self):
-        if self.times is None:
-            self.times = []
-
-    def add_result(self, result: RequestResult):
-        if result.error:
+    def add_result(self, status_code: Optional[int], duration: float,
+                   error: Optional[str] = None):
+        # Запросы пишут результат сразу сюда, без промежуточного объекта
+        if error:
             self.error_count += 1
-        elif result.status_code and 400 <= result.status_code < 600:
+        elif FAIL_STATUS[status_code or 0]:
             self.failed_count += 1
         else:
             self.success_count += 1
         
-        if result.duration > 0:
-            self.times.append(result.duration)
-
-    @property
-    def min_time(self) -> float:
-        return min(self.times) if self.times else 0
-
-    @property
-    def max_time(self) -> float:
-        return max(self.times) if self.times else 0
+        if duration > 0:
+            if self.n == 0 or duration < self.min_t:
+                self.min_t = duration
+            if duration > self.max_t:
+                self.max_t = duration
+            self.n += 1
+            self.sum_t += duration
 
     @property
     def avg_time(self) -> float:
-        return sum(self.times) / len(self.times) if self.times else 0
+        return self.sum_t / self.n if self.n else 0
 
 class ServerBenchmark:
     def __init__(self):
         self.stats = {}
+        # Разобранные URL хостов, заполняется в main
+        self.urls = {}
+        # Создаётся в run_tests, внутри работающего цикла событий
+        self.semaphore = None
+        # (?m): ^ и $ срабатывают на границах строк, что позволяет
+        # проверить весь список хостов одним проходом finditer
         self.url_pattern = re.compile(
-            r'^https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)$'
+            r'(?m)^https?://(?:www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)$'
         )
 
-    def validate_url(self, url: str) -> bool:
-        """Проверка формата URL"""
-        return bool(self.url_pattern.match(url))
+    def validate_urls(self, hosts: List[str]) -> Set[str]:
+        """Проверка формата URL одним проходом по всему списку"""
+        return {m.group(0) for m in self.url_pattern.finditer('\n'.join(hosts))}
+
+    def parse_url(self, host: str) -> Optional[URL]:
+        """Разбор URL; None, если yarl не может его разобрать"""
+        try:
+            url = URL(host)
+            url.port  # в старых версиях yarl порт проверяется лениво
+        except ValueError:
+            return None
+        return url
 
     def parse_args(self):
         parser = argparse.ArgumentParser(
@@ -87,109 +135,93 @@ class ServerBenchmark:
         
         return args
 
-    async def fetch_url(self, session: aiohttp.ClientSession, 
-                       url: str, timeout: int = 10) -> RequestResult:
+    async def fetch_url(self, session: aiohttp.ClientSession, stats: HostStats,
+                       url: URL, timeout: int = 10):
         """Выполнение одного HTTP-запроса"""
-        start_time = time.time()
-        try:
-            async with session.get(url, timeout=timeout) as response:
-                duration = time.time() - start_time
-                success = 200 <= response.status < 400
-                return RequestResult(
-                    host=url,
-                    success=success,
-                    status_code=response.status,
-                    duration=duration
-                )
-        except aiohttp.ClientError as e:
-            duration = time.time() - start_time
-            return RequestResult(
-                host=url,
-                success=False,
-                status_code=None,
-                duration=duration,
-                error=str(e)
-            )
-        except asyncio.TimeoutError:
-            duration = time.time() - start_time
-            return RequestResult(
-                host=url,
-                success=False,
-                status_code=None,
-                duration=duration,
-                error="Timeout"
-            )
-        except Exception as e:
-            duration = time.time() - start_time
-            return RequestResult(
-                host=url,
-                success=False,
-                status_code=None,
-                duration=duration,
-                error=f"Unexpected error: {str(e)}"
-            )
-
-    async def test_host(self, host: str, count: int):
-        """Тестирование одного хоста"""
-        if not self.validate_url(host):
-            print(f"Предупреждение: пропускаем некорректный URL - {host}")
-            return
+        async with self.semaphore:
+            start_time = time.perf_counter()
+            try:
+                # Тело ответа не нужно: хватает статуса и заголовков
+                async with session.head(url, allow_redirects=True,
+                                        timeout=timeout) as response:
+                    status = response.status
+                if status == 405:
+                    # HEAD не поддерживается - запрашиваем только первый байт
+                    start_time = time.perf_counter()
+                    async with session.get(url, headers=RANGE_HEADERS,
+                                           timeout=timeout) as response:
+                        status = response.status
+                duration = time.perf_counter() - start_time
+                stats.add_result(status, duration)
+            except aiohttp.ClientError as e:
+                duration = time.perf_counter() - start_time
+                stats.add_result(None, duration, str(e))
+            except asyncio.TimeoutError:
+                duration = time.perf_counter() - start_time
+                stats.add_result(None, duration, "Timeout")
+            except Exception as e:
+                duration = time.perf_counter() - start_time
+                stats.add_result(None, duration, f"Unexpected error: {str(e)}")
 
+    async def test_host(self, session: aiohttp.ClientSession,
+                        host: str, count: int):
+        """Тестирование одного хоста (URL уже проверен в main)"""
         if host not in self.stats:
             self.stats[host] = HostStats(host=host)
 
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            tasks = [self.fetch_url(session, host) for _ in range(count)]
-            results = await asyncio.gather(*tasks)
-            
-            for result in results:
-                self.stats[host].add_result(result)
+        url = self.urls[host]
+        # Каждый запрос сам учитывает свой результат в статистике хоста
+        stats = self.stats[host]
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(count):
+                tg.create_task(self.fetch_url(session, stats, url))
 
     async def run_tests(self, hosts: List[str], count: int):
         """Запуск всех тестов"""
-        tasks = [self.test_host(host, count) for host in hosts]
-        await asyncio.gather(*tasks)
+        # Ограничиваем число одновременных запросов, чтобы не перегружать пул
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        # Одна сессия на все хосты: общий пул соединений и кэш DNS.
+        # С aiodns имена разрешаются асинхронно, а не в пуле потоков
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONCURRENCY, limit_per_host=MAX_CONCURRENCY,
+            resolver=AsyncResolver() if aiodns is not None else None,
+            use_dns_cache=True, ttl_dns_cache=600
+        )
+        async with aiohttp.ClientSession(timeout=timeout,
+                                         connector=connector) as session:
+            async with asyncio.TaskGroup() as tg:
+                for host in hosts:
+                    tg.create_task(self.test_host(session, host, count))
+
+    def write_stats(self, write):
+        """Запись статистики через переданную функцию write"""
+        for host, stat in self.stats.items():
+            write(STATS_TEMPLATE.format(host=host, stat=stat))
 
     def print_stats(self, output_file: Optional[str] = None):
         """Вывод статистики"""
-        output_lines = []
-        
-        for host, stat in self.stats.items():
-            output_lines.append(f"\n{'='*60}")
-            output_lines.append(f"Host: {host}")
-            output_lines.append(f"{'-'*60}")
-            output_lines.append(f"Success:        {stat.success_count}")
-            output_lines.append(f"Failed (4xx/5xx): {stat.failed_count}")
-            output_lines.append(f"Errors:         {stat.error_count}")
-            output_lines.append(f"Min time:       {stat.min_time:.3f} сек")
-            output_lines.append(f"Max time:       {stat.max_time:.3f} сек")
-            output_lines.append(f"Avg time:       {stat.avg_time:.3f} сек")
-            output_lines.append(f"{'='*60}")
-        
-        output_text = "\n".join(output_lines)
-        
         if output_file:
             try:
                 with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(output_text)
+                    self.write_stats(f.write)
                 print(f"Результаты сохранены в файл: {output_file}")
             except Exception as e:
                 print(f"Ошибка при записи в файл: {e}")
-                print(output_text)
+                self.write_stats(sys.stdout.write)
         else:
-            print(output_text)
+            self.write_stats(sys.stdout.write)
 
     async def read_hosts_from_file(self, filepath: str) -> List[str]:
         """Чтение хостов из файла"""
         try:
-            async with aiofiles.open(filepath, mode='r', encoding='utf-8') as f:
-                content = await f.read()
+            content = await asyncio.to_thread(Path(filepath).read_bytes)
             
+            # Фильтруем строки как байты и декодируем только оставшиеся
             hosts = [
-                line.strip() 
-                for line in content.split('\n') 
-                if line.strip() and not line.startswith('#')
+                host.decode('utf-8')
+                for line in content.splitlines()
+                if not line.startswith(b'#') and (host := line.strip())
             ]
             return hosts
         except Exception as e:
@@ -211,9 +243,13 @@ class ServerBenchmark:
             print("Ошибка: не указаны хосты для тестирования")
             sys.exit(1)
         
+        valid = self.validate_urls(hosts)
         valid_hosts = []
         for host in hosts:
-            if self.validate_url(host):
+            url = self.parse_url(host) if host in valid else None
+            if url is not None:
+                # Разбираем URL один раз, чтобы aiohttp не делал это на каждый запрос
+                self.urls[host] = url
                 valid_hosts.append(host)
             else:
                 print(f"Предупреждение: пропускаем некорректный URL - {host}")
@@ -234,8 +270,10 @@ class ServerBenchmark:
 
 def main():
     """Точка входа"""
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
     benchmark = ServerBenchmark()
-    asyncio.run(benchmark.main())
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(benchmark.main())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,123 +1,472 @@
+import abc
 import argparse
 import asyncio
-import aiohttp
-import aiofiles
+import importlib.util
+import json
 import time
 import sys
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
 import re
 
-@dataclass
-class RequestResult:
+# Признак ответа-ошибки (4xx/5xx) по коду статуса; коды HTTP трёхзначные
+FAIL_STATUS = bytearray(1000)
+FAIL_STATUS[400:600] = b'\x01' * 200
+
+# Заголовки GET-запроса для серверов, не поддерживающих HEAD
+RANGE_HEADERS = {'Range': 'bytes=0-0'}
+
+# Предел одновременных запросов. Пул соединений к хосту не меньше него,
+# иначе ожидание свободного соединения попадает в замер времени ответа
+MAX_CONCURRENCY = 100
+
+# Максимальная длина строки JSON в протоколе демона (список хостов в задании)
+DAEMON_LINE_LIMIT = 16 * 1024 * 1024
+
+# Блок результатов по одному хосту, собирается одним вызовом format
+RESULTS_TEMPLATE = (
+    "=" * 60 + "\n"
+    "Host: {stats.url}\n"
+    + "-" * 60 + "\n"
+    "Success:              {stats.success}\n"
+    "Failed:               {stats.failed}\n"
+    "Errors:               {stats.errors}\n"
+    "Min:                  {stats.min_t:.3f} сек\n"
+    "Max:                  {stats.max_t:.3f} сек\n"
+    "Avg:                  {stats.avg_time:.3f} сек\n"
+    + "=" * 60 + "\n\n"
+)
+
+@dataclass(slots=True)
+class HostStats:
     url: str
-    success: bool
-    status: Optional[int]
-    duration: float
-    error: Optional[str] = None
+    success: int = 0
+    failed: int = 0
+    errors: int = 0
+    # Время считается на лету, без хранения всех замеров
+    n: int = 0
+    sum_t: float = 0.0
+    min_t: float = 0.0
+    max_t: float = 0.0
+
+    def add_result(self, status: Optional[int], duration: float,
+                   error: Optional[str] = None):
+        # Запросы пишут результат сразу сюда, без промежуточного объекта
+        if status and 200 <= status < 400:
+            self.success += 1
+        if FAIL_STATUS[status or 0]:
+            self.failed += 1
+        if error:
+            self.errors += 1
+        
+        if duration > 0:
+            if self.n == 0 or duration < self.min_t:
+                self.min_t = duration
+            if duration > self.max_t:
+                self.max_t = duration
+            self.n += 1
+            self.sum_t += duration
+
+    @property
+    def avg_time(self) -> float:
+        return self.sum_t / self.n if self.n else 0
+
+def module_installed(name: str) -> bool:
+    """Проверка наличия модуля без его импорта.
+
+    HTTP-клиенты импортируются лениво, только при открытии бэкенда,
+    чтобы клиент демона (--connect) не тратил время на их загрузку.
+    """
+    return importlib.util.find_spec(name) is not None
+
+class HttpBackend(abc.ABC):
+    """Базовый HTTP-клиент, через который выполняются запросы"""
+    name = ''
+    # fetch_batch выполняет пачку сам, без отдельных вызовов fetch
+    batched = False
+    # Необязательная зависимость бэкенда установлена
+    available = True
+
+    def __init__(self, urls: List[str], count: int):
+        self.urls = urls
+        self.count = count
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    @abc.abstractmethod
+    async def fetch(self, url: str, stats: HostStats):
+        """Один запрос к url, результат записывается в stats"""
+
+    async def fetch_batch(self, url: str, count: int, stats: HostStats):
+        """count запросов к url; по умолчанию - параллельные вызовы fetch"""
+        await asyncio.gather(*(self.fetch(url, stats) for _ in range(count)))
+
+class AiohttpBackend(HttpBackend):
+    name = 'aiohttp'
+
+    def __init__(self, urls: List[str], count: int):
+        super().__init__(urls, count)
+        self.limit = max(100, len(urls) * count)
+        self.session = None
+
+    async def __aenter__(self):
+        import aiohttp
+        
+        # С aiodns имена разрешаются асинхронно, а не в пуле потоков
+        resolver = None
+        if module_installed('aiodns'):
+            from aiohttp.resolver import AsyncResolver
+            resolver = AsyncResolver()
+        
+        # Держим соединения тёплыми между запросами к одному хосту
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=MAX_CONCURRENCY,
+            keepalive_timeout=75,
+            resolver=resolver,
+            use_dns_cache=True,
+            ttl_dns_cache=600,
+            enable_cleanup_closed=True,
+            force_close=False
+        )
+        timeout = aiohttp.ClientTimeout(total=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def fetch(self, url: str, stats: HostStats):
+        start_time = time.perf_counter()
+        try:
+            # Тело ответа не нужно: хватает статуса и заголовков
+            async with self.session.head(url, allow_redirects=True, timeout=10) as response:
+                status = response.status
+            if status == 405:
+                # HEAD не поддерживается - запрашиваем только первый байт
+                start_time = time.perf_counter()
+                async with self.session.get(url, headers=RANGE_HEADERS, timeout=10) as response:
+                    status = response.status
+            stats.add_result(status, time.perf_counter() - start_time)
+        except asyncio.TimeoutError:
+            stats.add_result(None, time.perf_counter() - start_time, "Timeout")
+        except Exception as e:
+            stats.add_result(None, time.perf_counter() - start_time, str(e))
+
+class RustyReqBackend(HttpBackend):
+    """Пачка запросов к хосту уходит в rusty-req одним вызовом"""
+    name = 'rusty-req'
+    batched = True
+    available = module_installed('rusty_req')
+
+    async def fetch(self, url: str, stats: HostStats):
+        await self.fetch_batch(url, 1, stats)
+
+    async def send_batch(self, url: str, count: int, method: str,
+                         headers: Optional[dict] = None) -> List[dict]:
+        import rusty_req
+        
+        requests = [
+            rusty_req.RequestItem(url=url, method=method, headers=headers or {}, timeout=10)
+            for _ in range(count)
+        ]
+        return await rusty_req.fetch_requests(
+            requests, total_timeout=30, mode=rusty_req.ConcurrencyMode.SELECT_ALL
+        )
+
+    async def fetch_batch(self, url: str, count: int, stats: HostStats):
+        responses = await self.send_batch(url, count, "HEAD")
+        if any(response.get("http_status") == 405 for response in responses):
+            # HEAD не поддерживается - запрашиваем только первый байт
+            responses = await self.send_batch(url, count, "GET", RANGE_HEADERS)
+        
+        for response in responses:
+            status = response.get("http_status") or None
+            duration = float(response.get("meta", {}).get("process_time") or 0)
+            exception = response.get("exception") or {}
+            # Ответы 4xx/5xx rusty-req тоже помечает исключением HttpStatusError
+            if not status or exception.get("type") not in (None, "", "HttpStatusError"):
+                error = exception.get("message") or exception.get("type") or "No response"
+                stats.add_result(None, duration, error)
+            else:
+                stats.add_result(status, duration)
+
+class HttpxBackend(HttpBackend):
+    """Запросы к одному хосту мультиплексируются в одно соединение HTTP/2"""
+    name = 'httpx'
+    # h2 нужен httpx для HTTP/2 (устанавливается как httpx[http2])
+    available = module_installed('httpx') and module_installed('h2')
+
+    def __init__(self, urls: List[str], count: int):
+        super().__init__(urls, count)
+        self.client = None
+        self.timeout_error = None
+
+    async def __aenter__(self):
+        import httpx
+        
+        self.timeout_error = httpx.TimeoutException
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=64),
+            timeout=10,
+            follow_redirects=True
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+
+    async def fetch(self, url: str, stats: HostStats):
+        start_time = time.perf_counter()
+        try:
+            # Тело ответа не нужно: хватает статуса и заголовков
+            response = await self.client.head(url)
+            status = response.status_code
+            if status == 405:
+                # HEAD не поддерживается - запрашиваем только первый байт
+                start_time = time.perf_counter()
+                response = await self.client.get(url, headers=RANGE_HEADERS)
+                status = response.status_code
+            stats.add_result(status, time.perf_counter() - start_time)
+        except self.timeout_error:
+            stats.add_result(None, time.perf_counter() - start_time, "Timeout")
+        except Exception as e:
+            stats.add_result(None, time.perf_counter() - start_time, str(e))
+
+BACKENDS = {
+    AiohttpBackend.name: AiohttpBackend,
+    RustyReqBackend.name: RustyReqBackend,
+    HttpxBackend.name: HttpxBackend,
+}
+
+def make_backend(name: str, urls: List[str], count: int) -> HttpBackend:
+    backend_class = BACKENDS[name]
+    if not backend_class.available:
+        print(f"Предупреждение: зависимости бэкенда {name} не установлены, используется aiohttp")
+        backend_class = AiohttpBackend
+    return backend_class(urls, count)
+
+async def send_message(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+    await writer.drain()
+
+def client_disconnected(next_line: asyncio.Task) -> bool:
+    """Чтение следующей строки от клиента завершилось EOF"""
+    return (next_line.done() and not next_line.cancelled()
+            and next_line.exception() is None and not next_line.result())
 
 class AsyncHttpBenchmark:
-    def __init__(self):
-        self.semaphore = asyncio.Semaphore(10)
+    def __init__(self, backend: str = AiohttpBackend.name):
+        self.backend = backend
+        # Создаётся в run_benchmark, внутри работающего цикла событий
+        self.semaphore = None
         self.url_pattern = re.compile(r'^https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+')
     
-    async def make_request(self, session: aiohttp.ClientSession, url: str) -> RequestResult:
+    async def make_request(self, backend: HttpBackend, url: str, stats: HostStats):
         async with self.semaphore:
-            start_time = time.time()
-            try:
-                async with session.get(url, timeout=10) as response:
-                    duration = time.time() - start_time
-                    return RequestResult(
-                        url=url,
-                        success=200 <= response.status < 400,
-                        status=response.status,
-                        duration=duration
-                    )
-            except asyncio.TimeoutError:
-                return RequestResult(url=url, success=False, status=None, 
-                                   duration=time.time()-start_time, error="Timeout")
-            except Exception as e:
-                return RequestResult(url=url, success=False, status=None,
-                                   duration=time.time()-start_time, error=str(e))
-    
-    async def benchmark_host(self, session: aiohttp.ClientSession, 
-                           url: str, count: int) -> List[RequestResult]:
-        tasks = [self.make_request(session, url) for _ in range(count)]
-        return await asyncio.gather(*tasks)
+            await backend.fetch(url, stats)
+    
+    async def benchmark_host(self, backend: HttpBackend, 
+                           url: str, count: int) -> HostStats:
+        stats = HostStats(url=url)
+        if backend.batched:
+            # Пачка уходит частями, чтобы к хосту было не больше MAX_CONCURRENCY запросов
+            for start in range(0, count, MAX_CONCURRENCY):
+                await backend.fetch_batch(url, min(MAX_CONCURRENCY, count - start), stats)
+            return stats
+        # Каждый запрос сам учитывает свой результат в статистике хоста
+        tasks = [self.make_request(backend, url, stats) for _ in range(count)]
+        await asyncio.gather(*tasks)
+        return stats
     
     async def run_benchmark(self, urls: List[str], count: int, output_file: Optional[str] = None):
         print(f"Тестирование {len(urls)} хостов...")
         print(f"Количество запросов на каждый хост: {count}")
         print("Выполнение...\n")
         
-        start_total = time.time()
+        # Параллельность растёт с числом запросов, но не больше MAX_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(min(MAX_CONCURRENCY, max(10, len(urls) * count)))
         
-        async with aiohttp.ClientSession() as session:
+        start_total = time.perf_counter()
+        
+        async with make_backend(self.backend, urls, count) as backend:
             all_tasks = []
             for url in urls:
-                all_tasks.append(self.benchmark_host(session, url, count))
+                all_tasks.append(self.benchmark_host(backend, url, count))
             
-            all_results = await asyncio.gather(*all_tasks)
+            all_stats = await asyncio.gather(*all_tasks)
         
-        total_time = time.time() - start_total
+        total_time = time.perf_counter() - start_total
         
-        self.print_results(urls, all_results, total_time, output_file)
+        self.print_results(all_stats, total_time, output_file)
+    
+    def write_results(self, all_stats: List[HostStats], write):
+        for stats in all_stats:
+            write(RESULTS_TEMPLATE.format(stats=stats))
     
-    def print_results(self, urls: List[str], all_results: List[List[RequestResult]], 
+    def print_results(self, all_stats: List[HostStats], 
                      total_time: float, output_file: Optional[str]):
         
-        output_lines = []
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                self.write_results(all_stats, f.write)
+            print(f"Результаты сохранены в файл: {output_file}")
+        else:
+            self.write_results(all_stats, sys.stdout.write)
         
-        for url, results in zip(urls, all_results):
-            success = [r for r in results if r.success]
-            failed = [r for r in results if r.status and 400 <= r.status < 600]
-            errors = [r for r in results if r.error]
-            times = [r.duration for r in results if r.duration > 0]
-            
-            output_lines.append("=" * 60)
-            output_lines.append(f"Host: {url}")
-            output_lines.append("-" * 60)
-            output_lines.append(f"Success:              {len(success)}")
-            output_lines.append(f"Failed:               {len(failed)}")
-            output_lines.append(f"Errors:               {len(errors)}")
-            
-            if times:
-                output_lines.append(f"Min:                  {min(times):.3f} сек")
-                output_lines.append(f"Max:                  {max(times):.3f} сек")
-                output_lines.append(f"Avg:                  {sum(times)/len(times):.3f} сек")
-            else:
-                output_lines.append("Min:                  0.000 сек")
-                output_lines.append("Max:                  0.000 сек")
-                output_lines.append("Avg:                  0.000 сек")
+        print(f"\nОбщее время тестирования: {total_time:.2f} сек")
+    
+    async def serve(self, socket_path: str):
+        """Режим демона: HTTP-клиент остаётся открытым между запусками"""
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        
+        async with make_backend(self.backend, [], 1) as backend:
+            async def handle(reader, writer):
+                await self.handle_client(backend, reader, writer)
             
-            output_lines.append("=" * 60 + "\n")
+            server = await asyncio.start_unix_server(handle, path=socket_path,
+                                                     limit=DAEMON_LINE_LIMIT)
+            print(f"Демон запущен, сокет: {socket_path}")
+            async with server:
+                await server.serve_forever()
+    
+    def parse_task(self, line: bytes) -> Tuple[List[str], int]:
+        """Разбор задания демону; ValueError, если оно некорректно"""
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("ожидается объект JSON")
+        urls = request.get('hosts')
+        count = request.get('count')
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            raise ValueError("hosts должен быть непустым списком строк")
+        if type(count) is not int or count < 1:
+            raise ValueError("count должен быть целым числом не меньше 1")
+        invalid = [url for url in urls if not self.url_pattern.match(url)]
+        if invalid:
+            raise ValueError(f"некорректные URL: {', '.join(invalid)}")
+        return urls, count
+    
+    async def handle_client(self, backend: HttpBackend, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter):
+        # Задания приходят строками JSON {"hosts": [...], "count": N},
+        # статистика по каждому хосту отправляется сразу по готовности.
+        # Следующая строка читается параллельно с заданием: EOF во время
+        # задания означает, что клиент отключился и запросы нужно отменить
+        tasks = []
+        next_line = asyncio.create_task(reader.readline())
+        try:
+            while True:
+                try:
+                    line = await next_line
+                except ValueError:
+                    # Строка длиннее DAEMON_LINE_LIMIT, дальнейший поток не разобрать
+                    await send_message(writer, {'error': f"задание длиннее {DAEMON_LINE_LIMIT} байт"})
+                    break
+                if not line:
+                    break
+                next_line = asyncio.create_task(reader.readline())
+                try:
+                    urls, count = self.parse_task(line)
+                except ValueError as e:
+                    await send_message(writer, {'error': f"некорректное задание: {e}"})
+                    continue
+                
+                start_total = time.perf_counter()
+                tasks = [asyncio.create_task(self.benchmark_host(backend, url, count))
+                         for url in urls]
+                pending = set(tasks)
+                while pending:
+                    watched = pending if next_line.done() else pending | {next_line}
+                    done, _ = await asyncio.wait(watched, return_when=asyncio.FIRST_COMPLETED)
+                    if client_disconnected(next_line):
+                        return
+                    for task in done - {next_line}:
+                        pending.discard(task)
+                        await send_message(writer, asdict(task.result()))
+                await send_message(writer, {'total_time': time.perf_counter() - start_total})
+        except ConnectionError:
+            pass
+        finally:
+            next_line.cancel()
+            for task in tasks:
+                task.cancel()
+            writer.close()
+    
+    async def run_remote(self, socket_path: str, urls: List[str], count: int,
+                         output_file: Optional[str] = None):
+        """Отправка задания демону и вывод результатов по мере поступления"""
+        try:
+            reader, writer = await asyncio.open_unix_connection(socket_path,
+                                                                limit=DAEMON_LINE_LIMIT)
+        except OSError as e:
+            print(f"Ошибка: не удалось подключиться к демону {socket_path}: {e}")
+            sys.exit(1)
+        
+        print(f"Тестирование {len(urls)} хостов через демон...")
+        print(f"Количество запросов на каждый хост: {count}")
+        print("Выполнение...\n")
         
-        output_text = "\n".join(output_lines)
+        total_time = 0.0
+        f = open(output_file, 'w', encoding='utf-8') if output_file else None
+        write = f.write if f else sys.stdout.write
+        try:
+            await send_message(writer, {'hosts': urls, 'count': count})
+            while line := await reader.readline():
+                message = json.loads(line)
+                if 'error' in message:
+                    print(f"Ошибка демона: {message['error']}")
+                    sys.exit(1)
+                if 'total_time' in message:
+                    total_time = message['total_time']
+                    break
+                self.write_results([HostStats(**message)], write)
+        finally:
+            writer.close()
+            if f:
+                f.close()
         
         if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(output_text)
             print(f"Результаты сохранены в файл: {output_file}")
-        else:
-            print(output_text)
-        
         print(f"\nОбщее время тестирования: {total_time:.2f} сек")
     
     async def read_urls_from_file(self, filename: str) -> List[str]:
-        async with aiofiles.open(filename, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        return [line.strip() for line in content.split('\n') 
-                if line.strip() and not line.startswith('#')]
+        content = await asyncio.to_thread(Path(filename).read_bytes)
+        # Фильтруем строки как байты и декодируем только оставшиеся
+        return [url.decode('utf-8') for line in content.splitlines()
+                if not line.startswith(b'#') and (url := line.strip())]
 
-async def main():
+def parse_args():
     parser = argparse.ArgumentParser(description='Тестирование доступности серверов по HTTP')
     parser.add_argument('-H', '--hosts', help='Хосты через запятую (без пробелов)')
     parser.add_argument('-F', '--file', help='Файл со списком URL (по одному на строку)')
     parser.add_argument('-C', '--count', type=int, default=1, 
                        help='Количество запросов на хост (по умолчанию: 1)')
     parser.add_argument('-O', '--output', help='Файл для сохранения результатов')
+    parser.add_argument('-B', '--backend', choices=list(BACKENDS),
+                       help='HTTP-клиент для запросов (по умолчанию: aiohttp)')
+    parser.add_argument('--daemon', metavar='SOCKET',
+                       help='Запустить демон на unix-сокете и держать HTTP-клиент открытым')
+    parser.add_argument('--connect', metavar='SOCKET',
+                       help='Выполнить тестирование через демон на unix-сокете')
+    
+    return parser.parse_args()
+
+async def main(args):
+    backend = args.backend or AiohttpBackend.name
+    
+    if args.daemon:
+        await AsyncHttpBenchmark(backend).serve(args.daemon)
+        return
     
-    args = parser.parse_args()
+    if args.connect and args.backend:
+        print("Ошибка: HTTP-клиент демона задаётся ключом -B при его запуске (--daemon)")
+        sys.exit(1)
     
     if not args.hosts and not args.file:
         print("Ошибка: укажите хосты через -H или файл через -F")
@@ -127,7 +476,7 @@ async def main():
         print("Ошибка: укажите только один из параметров -H или -F")
         sys.exit(1)
     
-    benchmark = AsyncHttpBenchmark()
+    benchmark = AsyncHttpBenchmark(backend)
     
     if args.file:
         urls = await benchmark.read_urls_from_file(args.file)
@@ -145,7 +494,17 @@ async def main():
         print("Ошибка: нет валидных URL для тестирования")
         sys.exit(1)
     
-    await benchmark.run_benchmark(valid_urls, args.count, args.output)
+    if args.connect:
+        await benchmark.run_remote(args.connect, valid_urls, args.count, args.output)
+    else:
+        await benchmark.run_benchmark(valid_urls, args.count, args.output)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    # Клиенту демона uvloop не нужен: запросы выполняет сам демон
+    loop_factory = None
+    if not args.connect and module_installed('uvloop'):
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main(args))